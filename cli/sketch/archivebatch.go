@@ -0,0 +1,116 @@
+// This file is part of arduino-cli.
+//
+// Copyright 2020 ARDUINO SA (http://www.arduino.cc/)
+//
+// This software is released under the GNU General Public License version 3,
+// which covers the main part of arduino-cli.
+// The terms of this license can be found at:
+// https://www.gnu.org/licenses/gpl-3.0.en.html
+//
+// You can be released from the requirements of the above licenses by purchasing
+// a commercial license. Buying such a license is mandatory if you want to
+// modify or otherwise use the software for commercial activities involving the
+// Arduino software without disclosing the source code of your own applications.
+// To purchase a commercial license, send an email to license@arduino.cc.
+
+package sketch
+
+import (
+	"context"
+	"encoding/json"
+	"io/ioutil"
+	"os"
+
+	"github.com/arduino/arduino-cli/cli/errorcodes"
+	"github.com/arduino/arduino-cli/cli/feedback"
+	"github.com/arduino/arduino-cli/commands/sketch"
+	rpc "github.com/arduino/arduino-cli/rpc/cc/arduino/cli/commands/v1"
+	"github.com/sirupsen/logrus"
+	"github.com/spf13/cobra"
+)
+
+// initArchiveBatchCommand creates the hidden `archive-batch` command, a
+// development helper that lets the integration test suite run many
+// `sketch archive` cases in a single process instead of paying the
+// startup cost of the CLI once per case.
+func initArchiveBatchCommand() *cobra.Command {
+	command := &cobra.Command{
+		Use:   "archive-batch <casesFile>",
+		Short: "Creates the batch of sketch archives described by a JSON file.",
+		Long: "Creates the batch of sketch archives described by a JSON file and prints a JSON report.\n" +
+			"This is a development helper for the integration test suite, not a stable interface.",
+		Hidden: true,
+		Args:   cobra.ExactArgs(1),
+		Run:    runArchiveBatchCommand,
+	}
+	return command
+}
+
+type archiveBatchCase struct {
+	ID              string `json:"id"`
+	Cwd             string `json:"cwd"`
+	SketchPath      string `json:"sketch_path"`
+	ArchivePath     string `json:"archive_path"`
+	IncludeBuildDir bool   `json:"include_build_dir"`
+}
+
+type archiveBatchResult struct {
+	ID    string `json:"id"`
+	Ok    bool   `json:"ok"`
+	Error string `json:"error,omitempty"`
+}
+
+func runArchiveBatchCommand(cmd *cobra.Command, args []string) {
+	logrus.Info("Executing `arduino sketch archive-batch`")
+
+	data, err := ioutil.ReadFile(args[0])
+	if err != nil {
+		feedback.Errorf("Error reading batch file: %v", err)
+		os.Exit(errorcodes.ErrGeneric)
+	}
+
+	var cases []archiveBatchCase
+	if err := json.Unmarshal(data, &cases); err != nil {
+		feedback.Errorf("Error parsing batch file: %v", err)
+		os.Exit(errorcodes.ErrGeneric)
+	}
+
+	results := make([]archiveBatchResult, 0, len(cases))
+	for _, batchCase := range cases {
+		result := archiveBatchResult{ID: batchCase.ID, Ok: true}
+		if err := runArchiveBatchCase(batchCase); err != nil {
+			result.Ok = false
+			result.Error = err.Error()
+		}
+		results = append(results, result)
+	}
+
+	out, err := json.Marshal(results)
+	if err != nil {
+		feedback.Errorf("Error serializing batch report: %v", err)
+		os.Exit(errorcodes.ErrGeneric)
+	}
+	feedback.Print(string(out))
+}
+
+func runArchiveBatchCase(batchCase archiveBatchCase) error {
+	// Relative sketch and archive paths are resolved against the case working
+	// directory, exactly like `sketch archive` resolves them against the
+	// process working directory.
+	if err := os.Chdir(batchCase.Cwd); err != nil {
+		return err
+	}
+
+	sketchPath := batchCase.SketchPath
+	if sketchPath == "" {
+		sketchPath = "."
+	}
+
+	_, err := sketch.ArchiveSketch(context.Background(),
+		&rpc.ArchiveSketchRequest{
+			SketchPath:      sketchPath,
+			ArchivePath:     batchCase.ArchivePath,
+			IncludeBuildDir: batchCase.IncludeBuildDir,
+		})
+	return err
+}
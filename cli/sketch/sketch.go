@@ -32,6 +32,7 @@ func NewCommand() *cobra.Command {
 
 	cmd.AddCommand(initNewCommand())
 	cmd.AddCommand(initArchiveCommand())
+	cmd.AddCommand(initArchiveBatchCommand())
 
 	return cmd
 }
@@ -20,6 +20,7 @@ import (
 	"context"
 	"fmt"
 	"io"
+	"os"
 	"path/filepath"
 	"strings"
 
@@ -82,6 +83,14 @@ func ArchiveSketch(ctx context.Context, req *rpc.ArchiveSketchRequest) (*rpc.Arc
 	zipWriter := zip.NewWriter(archive)
 	defer zipWriter.Close()
 
+	// Automation that only cares about the archive layout, like the
+	// integration test suite, can skip the DEFLATE pass entirely and
+	// store the files uncompressed.
+	compressionMethod := uint16(zip.Deflate)
+	if os.Getenv("ARDUINO_ARCHIVE_NO_COMPRESS") != "" {
+		compressionMethod = zip.Store
+	}
+
 	for _, f := range filesToZip {
 
 		if !req.IncludeBuildDir {
@@ -98,7 +107,7 @@ func ArchiveSketch(ctx context.Context, req *rpc.ArchiveSketchRequest) (*rpc.Arc
 
 		// We get the parent path since we want the archive to unpack as a folder.
 		// If we don't do this the archive would contain all the sketch files as top level.
-		err = addFileToSketchArchive(zipWriter, f, sketchPath.Parent())
+		err = addFileToSketchArchive(zipWriter, f, sketchPath.Parent(), compressionMethod)
 		if err != nil {
 			return nil, fmt.Errorf("Error adding file to archive: %v", err)
 		}
@@ -108,7 +117,7 @@ func ArchiveSketch(ctx context.Context, req *rpc.ArchiveSketchRequest) (*rpc.Arc
 }
 
 // Adds a single file to an existing zip file
-func addFileToSketchArchive(zipWriter *zip.Writer, filePath, sketchPath *paths.Path) error {
+func addFileToSketchArchive(zipWriter *zip.Writer, filePath, sketchPath *paths.Path, compressionMethod uint16) error {
 	f, err := filePath.Open()
 	if err != nil {
 		return err
@@ -131,7 +140,7 @@ func addFileToSketchArchive(zipWriter *zip.Writer, filePath, sketchPath *paths.P
 	}
 
 	header.Name = filePath.String()
-	header.Method = zip.Deflate
+	header.Method = compressionMethod
 
 	writer, err := zipWriter.CreateHeader(header)
 	if err != nil {
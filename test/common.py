@@ -15,11 +15,22 @@
 import os
 import collections
 import json
-
+import platform
+import shutil
 
 Board = collections.namedtuple("Board", "address fqbn package architecture id core")
 
 
+def link_or_copy_tree(src, dst):
+    """
+    Copies the src folder to dst hardlinking the contained files on POSIX,
+    so no file content is actually duplicated. Windows restricts hardlink
+    creation, there the files are really copied.
+    """
+    copy_function = shutil.copy2 if platform.system() == "Windows" else os.link
+    shutil.copytree(src, dst, copy_function=copy_function)
+
+
 def running_on_ci():
     """
     Returns whether the program is running on a CI environment
@@ -26,7 +26,18 @@ from invoke.context import Context
 import tempfile
 from filelock import FileLock
 
-from .common import Board
+from .common import Board, link_or_copy_tree
+
+
+def _serialize_cmd(cmd):
+    """
+    Turns an argv-style list into the command string expected by invoke.
+    Each argument is quoted as a whole, so callers don't have to hand-quote
+    paths containing spaces. Plain strings pass through untouched.
+    """
+    if isinstance(cmd, str):
+        return cmd
+    return " ".join(f'"{arg}"' for arg in cmd)
 
 
 @pytest.fixture(scope="function")
@@ -71,31 +82,34 @@ def downloads_dir(tmpdir_factory, worker_id):
     To save time and bandwidth, all the tests will access
     the same download cache folder.
     """
-    download_dir = tmpdir_factory.mktemp("ArduinoTest", numbered=False)
-
-    # This folders should be created only once per session, if we're running
-    # tests in parallel using multiple processes we need to make sure this
-    # this fixture is executed only once, thus the use of the lockfile
-    if not worker_id == "master":
-        lock = Path(download_dir / "lock")
-        with FileLock(lock):
-            if not lock.is_file():
-                lock.touch()
+    if worker_id == "master":
+        # Not running under pytest-xdist, the session owns the cache
+        download_dir = tmpdir_factory.mktemp("ArduinoTest", numbered=False)
+        yield str(download_dir)
+        shutil.rmtree(download_dir, ignore_errors=True)
+        return
+
+    # Each pytest-xdist worker gets its own basetemp (".../popen-gwN") but
+    # they all share the same parent folder, so that's where the common
+    # cache goes. The lockfile makes sure only one worker creates it.
+    download_dir = Path(str(tmpdir_factory.getbasetemp())).parent / "ArduinoDownloads"
+    with FileLock(str(download_dir) + ".lock"):
+        download_dir.mkdir(exist_ok=True)
 
     yield str(download_dir)
-    shutil.rmtree(download_dir, ignore_errors=True)
+    # No cleanup here: other workers may still be using the cache, the
+    # folder goes away with pytest's basetemp rotation.
 
 
 @pytest.fixture(scope="function")
-def working_dir(tmpdir_factory):
+def working_dir(tmp_path):
     """
-    A tmp folder to work in
-    will be created before running each test and deleted
-    at the end, this way all the tests work in isolation.
+    A tmp folder to work in, created per test so all the
+    tests work in isolation. It's backed by pytest's builtin
+    tmp_path fixture: pytest prunes old test-run folders by
+    itself, so no rmtree runs on the test's critical path.
     """
-    work_dir = tmpdir_factory.mktemp("ArduinoTestWork")
-    yield str(work_dir)
-    shutil.rmtree(work_dir, ignore_errors=True)
+    return tmp_path
 
 
 @pytest.fixture(scope="function")
@@ -113,16 +127,19 @@ def run_command(pytestconfig, data_dir, downloads_dir, working_dir):
         "ARDUINO_DATA_DIR": data_dir,
         "ARDUINO_DOWNLOADS_DIR": downloads_dir,
         "ARDUINO_SKETCHBOOK_DIR": data_dir,
+        # The tests only check which files end up in the archives produced by
+        # `sketch archive`, storing them uncompressed skips the DEFLATE pass
+        "ARDUINO_ARCHIVE_NO_COMPRESS": "1",
     }
     (Path(data_dir) / "packages").mkdir()
 
-    def _run(cmd_string, custom_working_dir=None, custom_env=None):
+    def _run(cmd, custom_working_dir=None, custom_env=None):
 
         if not custom_working_dir:
             custom_working_dir = working_dir
         if not custom_env:
             custom_env = env
-        cli_full_line = '"{}" {}'.format(cli_path, cmd_string)
+        cli_full_line = '"{}" {}'.format(cli_path, _serialize_cmd(cmd))
         run_context = Context()
         # It might happen that we need to change directories between drives on Windows,
         # in that case the "/d" flag must be used otherwise directory wouldn't change
@@ -138,6 +155,39 @@ def run_command(pytestconfig, data_dir, downloads_dir, working_dir):
     return _run
 
 
+@pytest.fixture(scope="session")
+def run_command_session(pytestconfig, tmpdir_factory):
+    """
+    Session-scoped variant of `run_command` for fixtures that invoke the CLI
+    once and share the result across tests. Commands run against a session-wide
+    data directory and the caller always passes the working directory.
+    """
+    cli_path = Path(pytestconfig.rootdir).parent / "arduino-cli"
+    data_dir = Path(str(tmpdir_factory.mktemp("ArduinoTestSession")))
+    (data_dir / "packages").mkdir()
+    env = {
+        "ARDUINO_DATA_DIR": str(data_dir),
+        "ARDUINO_DOWNLOADS_DIR": str(data_dir),
+        "ARDUINO_SKETCHBOOK_DIR": str(data_dir),
+        # The tests only check which files end up in the archives produced by
+        # `sketch archive`, storing them uncompressed skips the DEFLATE pass
+        "ARDUINO_ARCHIVE_NO_COMPRESS": "1",
+    }
+
+    def _run(cmd, custom_working_dir):
+        cli_full_line = '"{}" {}'.format(cli_path, _serialize_cmd(cmd))
+        run_context = Context()
+        # It might happen that we need to change directories between drives on Windows,
+        # in that case the "/d" flag must be used otherwise directory wouldn't change
+        cd_command = "cd"
+        if platform.system() == "Windows":
+            cd_command += " /d"
+        with run_context.prefix(f'{cd_command} "{custom_working_dir}"'):
+            return run_context.run(cli_full_line, echo=False, hide=True, warn=True, env=env, encoding="utf-8")
+
+    return _run
+
+
 @pytest.fixture(scope="function")
 def daemon_runner(pytestconfig, data_dir, downloads_dir, working_dir):
     """
@@ -212,14 +262,36 @@ def detected_boards(run_command):
     return detected_boards
 
 
+@pytest.fixture(scope="session")
+def sketch_cache(tmpdir_factory):
+    """
+    A session-wide read-only copy of the testdata sketches.
+    Tests never touch this copy directly, `copy_sketch` hardlinks
+    its files into each test's working directory so the same sketch
+    is not read and rewritten from scratch dozens of times per run.
+    """
+    cache_dir = Path(str(tmpdir_factory.mktemp("ArduinoTestSketches")))
+
+    def _cached(sketch_name):
+        cached_sketch = cache_dir / sketch_name
+        if not cached_sketch.exists():
+            shutil.copytree(Path(__file__).parent / "testdata" / sketch_name, cached_sketch)
+        return cached_sketch
+
+    yield _cached
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
 @pytest.fixture(scope="function")
-def copy_sketch(working_dir):
+def copy_sketch(sketch_cache, working_dir):
     def _copy(sketch_name):
-        # Copies sketch to working directory for testing
-        sketch_path = Path(__file__).parent / "testdata" / sketch_name
+        # Copies sketch to working directory for testing. The files are
+        # hardlinked from the session cache where the platform allows it,
+        # so each copy costs one syscall per file instead of a full
+        # read+write of its content.
         test_sketch_path = Path(working_dir, sketch_name)
-        shutil.copytree(sketch_path, test_sketch_path)
-        return str(test_sketch_path)
+        link_or_copy_tree(sketch_cache(sketch_name), test_sketch_path)
+        return test_sketch_path
 
     return _copy
 